@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caption Templates - Förkompilerade caption-mallar per konto och språk
+
+Mallarna ligger i templates/captions/<konto>_<språk>.json och laddas en
+gång per process. Slots (t.ex. {hashtags}) expanderas redan vid laddning
+så att varje variant bara behöver fylla i siffror och region.
+
+Användning:
+    python caption_templates.py bench   # varianter per sekund
+"""
+
+import re
+import sys
+import json
+import glob
+import time
+import random
+import itertools
+from functools import lru_cache
+from string import Formatter
+
+TEMPLATE_DIR = "templates/captions"
+PUBLISHED_DIR = "published"
+MAX_TWEET_LENGTH = 280
+RECENT_HISTORY = 50
+
+# Svensk typografi: hårt mellanslag som tusentalsavgränsare och före %
+NBSP = "\u00a0"
+
+_NUMBER_RE = re.compile(r"[+-]?\d[\d\s.,]*")
+
+
+def format_number(value, decimals=0):
+    """4052345 -> '4 052 345', 1.25 -> '1,25'"""
+    text = f"{value:,.{decimals}f}"
+    return text.replace(",", NBSP).replace(".", ",")
+
+
+def format_sek(value):
+    return f"{format_number(value)}{NBSP}SEK"
+
+
+def format_percent(value, decimals=1, signed=False):
+    text = format_number(abs(value), decimals)
+    if signed:
+        text = ("+" if value >= 0 else "-") + text
+    return f"{text}{NBSP}%"
+
+
+def tweet_length(text):
+    """Teckenlängd som Twitter räknar den (emoji m.fl. räknas dubbelt)"""
+    length = 0
+    for ch in text:
+        cp = ord(ch)
+        if cp <= 0x10FF or 0x2000 <= cp <= 0x200D or 0x2010 <= cp <= 0x201F or 0x2032 <= cp <= 0x2037:
+            length += 1
+        else:
+            length += 2
+    return length
+
+
+def skeleton(text):
+    """Caption utan siffror - används för att känna igen samma mall"""
+    return _NUMBER_RE.sub("#", text).strip()
+
+
+class CompiledTemplate:
+    """En mall där slots redan är expanderade, uppdelad i text/fält-segment"""
+
+    __slots__ = ("source", "parts", "fields")
+
+    def __init__(self, source):
+        self.source = source
+        parts = []
+        fields = []
+        for literal, field, _, _ in Formatter().parse(source):
+            if literal:
+                parts.append(literal)
+            if field is not None:
+                fields.append((len(parts), field))
+                parts.append(None)
+        self.parts = parts
+        self.fields = fields
+
+    def render(self, context):
+        parts = self.parts[:]
+        for i, field in self.fields:
+            parts[i] = context[field]
+        return "".join(parts)
+
+
+class CaptionEngine:
+    """Alla kompilerade varianter för ett konto och ett språk"""
+
+    def __init__(self, konto, lang, spec):
+        self.konto = konto
+        self.lang = lang
+        slots = spec.get("slots", {})
+        self.templates = {}
+
+        for kind, sources in spec.items():
+            if kind == "slots":
+                continue
+            compiled = []
+            for source in sources:
+                names = [f for _, f, _, _ in Formatter().parse(source) if f in slots]
+                names = list(dict.fromkeys(names))
+                for combo in itertools.product(*(slots[n] for n in names)):
+                    expanded = source
+                    for name, value in zip(names, combo):
+                        expanded = expanded.replace("{" + name + "}", value)
+                    expanded = re.sub(r" {2,}", " ", expanded).strip()
+                    compiled.append(CompiledTemplate(expanded))
+            self.templates[kind] = compiled
+
+    def render_variants(self, kind, context):
+        """Renderar alla varianter som ryms inom teckengränsen"""
+        variants = []
+        for template in self.templates[kind]:
+            text = template.render(context)
+            if tweet_length(text) <= MAX_TWEET_LENGTH:
+                variants.append(text)
+        return variants
+
+    def select(self, kind, context, recent=None, rng=random):
+        """
+        Väljer en variant vars mall inte använts i nyligen publicerade
+        captions. Faller tillbaka på valfri variant om alla är använda.
+        """
+        variants = self.render_variants(kind, context)
+        if not variants:
+            shortest = min((t.render(context) for t in self.templates[kind]), key=tweet_length)
+            return truncate(shortest)
+
+        recent = load_recent_skeletons() if recent is None else recent
+        fresh = [v for v in variants if skeleton(v) not in recent]
+        return rng.choice(fresh or variants)
+
+
+def truncate(text, limit=MAX_TWEET_LENGTH):
+    """Kapar vid närmaste ordgräns och lägger till …"""
+    if tweet_length(text) <= limit:
+        return text
+    ellipsis = "…"
+    budget = limit - tweet_length(ellipsis)
+    while tweet_length(text) > budget:
+        text = text[:-1]
+    cut = text.rsplit(" ", 1)[0] if " " in text else text
+    return cut.rstrip() + ellipsis
+
+
+@lru_cache(maxsize=None)
+def get_engine(konto, lang="sv"):
+    """Laddar och kompilerar mallarna en gång per konto och språk"""
+    path = f"{TEMPLATE_DIR}/{konto}_{lang}.json"
+    with open(path, encoding='utf-8') as f:
+        return CaptionEngine(konto, lang, json.load(f))
+
+
+def load_recent_skeletons(limit=RECENT_HISTORY):
+    """Skelett för de senast publicerade captions i published/"""
+    files = sorted(glob.glob(f"{PUBLISHED_DIR}/*.json"), reverse=True)[:limit]
+    recent = set()
+    for path in files:
+        try:
+            with open(path, encoding='utf-8') as f:
+                caption = json.load(f).get("caption")
+        except (OSError, ValueError):
+            continue
+        if caption:
+            recent.add(skeleton(caption))
+    return recent
+
+
+def select_caption(konto, kind, context, lang="sv", recent=None):
+    return get_engine(konto, lang).select(kind, context, recent)
+
+
+def bench(seconds=2.0):
+    engine = get_engine("konto1", "sv")
+    context = {
+        "region": "Stockholm",
+        "price": format_sek(6512345),
+        "change": format_percent(1.73),
+        "change_signed": format_percent(1.73, signed=True),
+    }
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        count += len(engine.render_variants("up", context))
+    elapsed = time.perf_counter() - start
+
+    per_call = len(engine.templates["up"])
+    print(f"📝 {per_call} varianter per anrop, {count / elapsed:,.0f} varianter/s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        bench()
+    else:
+        print(__doc__)
@@ -180,7 +180,8 @@ def generate_random_graph(df, output_dir):
     
     fig = graph_func(df, region)
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Mikrosekunder så att parallella renderingar inte skriver över varandra
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     filename = f"{output_dir}/housing_{graph_type}_{timestamp}.png"
     fig.savefig(filename, bbox_inches='tight', dpi=150, facecolor='white')
     plt.close(fig)
@@ -6,6 +6,7 @@ Med riktiga data-källor, bättre grafer och AI
 """
 
 import os
+import sys
 import json
 import requests
 import pandas as pd
@@ -15,8 +16,11 @@ import seaborn as sns
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from graph_generator import generate_random_graph
+import pipeline_metrics as metrics
+import resilience
+import caption_templates as captions
 import asyncio
-import random
+from concurrent.futures import ProcessPoolExecutor
 
 load_dotenv()
 
@@ -26,21 +30,38 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 HF_TOKEN = os.getenv("HUGGINGFACE_TOKEN")
 
+# API-adresser kan pekas om till lokala stand-ins (se offline_harness.py)
+SCB_API_URL = os.getenv("SCB_API_URL", "https://api.scb.se/OV0104/v1/doris/sv/ssd/START/BO/BO0104/BO0104D/BO0104T04")
+HF_API_URL = os.getenv("HF_API_URL", "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
+# Realistiska priser för svenska småhus (2024-2025)
+BASE_PRICES = {
+    'Stockholm': 6500000,
+    'Göteborg': 4800000,
+    'Malmö': 4200000,
+    'Riket': 3800000
+}
+
+HOUSING_REGIONS = [r.strip() for r in os.getenv("HOUSING_REGIONS", "").split(",") if r.strip()]
+
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(DATA_DIR, exist_ok=True)
 
 
-def fetch_housing_data():
+def fetch_housing_data(region=None):
     """
     Hämtar bostadsdata från flera källor (SCB, Mäklarstatistik, Booli)
     """
     print("📊 Hämtar bostadsdata...")
     
-    # Försök SCB först (gratis öppet API)
-    data = try_scb_api()
-    
-    if data is not None:
-        return data
+    # Försök SCB först (gratis öppet API). SCB-frågan gäller bara riket,
+    # enskilda regioner finns än så länge bara som mock-data.
+    if region in (None, 'Riket'):
+        data = try_scb_api()
+        
+        if data is not None:
+            return data
     
     # Backup: Mäklarstatistik CSV (om SCB failar)
     data = try_maklarstatistik_csv()
@@ -50,7 +71,7 @@ def fetch_housing_data():
     
     # Sista utväg: Mock-data med realistiska siffror
     print("⚠️ Använder mock-data (för demo)")
-    return create_realistic_mock_data()
+    return create_realistic_mock_data(region)
 
 
 def try_scb_api():
@@ -59,7 +80,7 @@ def try_scb_api():
     """
     try:
         # Exempel: Boende efter region
-        url = "https://api.scb.se/OV0104/v1/doris/sv/ssd/START/BO/BO0104/BO0104D/BO0104T04"
+        url = SCB_API_URL
         
         query = {
             "query": [
@@ -76,9 +97,14 @@ def try_scb_api():
             }
         }
         
-        response = requests.post(url, json=query, timeout=10)
+        # Hedgad: SCB-anropet är en idempotent läsning
+        with metrics.http("scb") as call:
+            response = resilience.call(
+                "scb", lambda timeout: requests.post(url, json=query, timeout=timeout),
+                max_timeout=10, hedge=True)
+            call["status"] = response.status_code if response is not None else resilience.last_outcome()
         
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             print("✅ Data från SCB hämtad")
             # Parse SCB response (detta är förenklat)
             return parse_scb_response(response.json())
@@ -113,7 +139,7 @@ def try_maklarstatistik_csv():
     return None
 
 
-def create_realistic_mock_data():
+def create_realistic_mock_data(region=None):
     """
     Realistiska siffror baserat på verkliga trender
     """
@@ -121,16 +147,9 @@ def create_realistic_mock_data():
     
     dates = pd.date_range(end=datetime.now(), periods=12, freq='ME')
     
-    # Realistiska priser för svenska småhus (2024-2025)
-    base_prices = {
-        'Stockholm': 6500000,
-        'Göteborg': 4800000,
-        'Malmö': 4200000,
-        'Riket': 3800000
-    }
-    
-    region = random.choice(list(base_prices.keys()))
-    base = base_prices[region]
+    if region is None:
+        region = random.choice(list(BASE_PRICES.keys()))
+    base = BASE_PRICES[region]
     
     # Simulera prisförändringar (baserat på verkliga trender)
     prices = []
@@ -253,7 +272,7 @@ TWEET:"""
     if not HF_TOKEN:
         return create_fallback_tweet(change_pct, latest, region)
     
-    api_url = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
+    api_url = HF_API_URL
     headers = {"Authorization": f"Bearer {HF_TOKEN}"}
     
     payload = {
@@ -267,16 +286,22 @@ TWEET:"""
     }
     
     try:
-        response = requests.post(api_url, headers=headers, json=payload, timeout=30)
+        # Ingen hedging: varje generering kostar inferenstid hos HF
+        with metrics.http("huggingface") as call:
+            response = resilience.call(
+                "huggingface",
+                lambda timeout: requests.post(api_url, headers=headers, json=payload, timeout=timeout),
+                max_timeout=30, min_timeout=5)
+            call["status"] = response.status_code if response is not None else resilience.last_outcome()
         
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             result = response.json()
             tweet = result[0]['generated_text'] if isinstance(result, list) else result['generated_text']
             tweet = tweet.replace(prompt, '').strip()
             
             # Cleanup
             tweet = tweet.split('\n')[0]  # Ta första raden
-            tweet = tweet[:280]  # Twitter limit
+            tweet = captions.truncate(tweet)  # Twitter limit
             
             if len(tweet) > 30:
                 print(f"✅ AI-tweet genererad")
@@ -290,24 +315,22 @@ TWEET:"""
 
 def create_fallback_tweet(change_pct, latest_price, region):
     """
-    Backup-tweets om AI failar
+    Backup-tweets om AI failar (mallar i templates/captions/konto1_sv.json)
     """
     if change_pct > 0:
-        templates = [
-            f"📈 Småhuspriser i {region} upp {abs(change_pct):.1f}%! Nu {latest_price:,.0f} SEK i snitt. Marknaden fortsätter stiga. #bostad #fastighet",
-            f"📊 Bostadspriserna i {region} ökar med {abs(change_pct):.1f}%. Genomsnittpris nu {latest_price:,.0f} SEK. #bostad #fastighet",
-        ]
+        kind = "up"
     elif change_pct < 0:
-        templates = [
-            f"📉 Småhuspriser i {region} ner {abs(change_pct):.1f}%. Ligger nu på {latest_price:,.0f} SEK i snitt. #bostad #fastighet",
-            f"📊 Bostadspriserna i {region} sjunker med {abs(change_pct):.1f}%. Genomsnitt: {latest_price:,.0f} SEK. #bostad #fastighet",
-        ]
+        kind = "down"
     else:
-        templates = [
-            f"➡️ Småhuspriser i {region} stabila på {latest_price:,.0f} SEK. Marknaden visar ingen större förändring. #bostad #fastighet",
-        ]
+        kind = "flat"
     
-    return random.choice(templates)
+    context = {
+        "region": region,
+        "price": captions.format_sek(latest_price),
+        "change": captions.format_percent(change_pct),
+        "change_signed": captions.format_percent(change_pct, signed=True),
+    }
+    return captions.select_caption("konto1", kind, context)
 
 
 async def send_telegram_notification(image_path, caption):
@@ -316,7 +339,7 @@ async def send_telegram_notification(image_path, caption):
     
     from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
     
-    bot = Bot(token=TELEGRAM_BOT_TOKEN)
+    bot = Bot(token=TELEGRAM_BOT_TOKEN, base_url=TELEGRAM_API_URL)
     
     keyboard = [
         [
@@ -345,13 +368,73 @@ async def send_telegram_notification(image_path, caption):
         "status": "pending"
     }
     
-    metadata_file = f"{DATA_DIR}/pending_post_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    metadata_file = f"{DATA_DIR}/pending_post_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{message.message_id}.json"
     with open(metadata_file, 'w', encoding='utf-8') as f:
         json.dump(metadata, f, indent=2, ensure_ascii=False)
     
     return metadata_file
 
 
+async def process_region(region, render_pool):
+    """
+    Pipeline för en region: hämta → (graf || tweet) → Telegram
+    Grafen renderas i en process-pool medan tweeten genereras.
+    """
+    loop = asyncio.get_running_loop()
+    
+    with metrics.stage("fetch", region=region):
+        housing_data = await asyncio.to_thread(fetch_housing_data, region)
+    region = housing_data['region'].iloc[0]
+    
+    async def render():
+        with metrics.stage("graph", region=region):
+            return await loop.run_in_executor(
+                render_pool, generate_random_graph, housing_data, OUTPUT_DIR)
+    
+    async def caption():
+        with metrics.stage("tweet", region=region):
+            return await asyncio.to_thread(generate_engaging_tweet, housing_data)
+    
+    (graph_path, graph_type), tweet = await asyncio.gather(render(), caption())
+    
+    with metrics.stage("telegram", region=region):
+        return await send_telegram_notification(graph_path, tweet)
+
+
+async def run_pipeline(regions):
+    """
+    Kör alla regioner parallellt och skickar varje post så fort den är klar
+    """
+    workers = max(1, min(len(regions), os.cpu_count() or 1))
+    failed = 0
+    
+    with ProcessPoolExecutor(max_workers=workers) as render_pool:
+        tasks = [asyncio.create_task(process_region(region, render_pool)) for region in regions]
+        
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                metadata_file = await next_done
+                print(f"📦 Metadata sparad: {metadata_file}")
+            except Exception as e:
+                failed += 1
+                print(f"❌ Region misslyckades: {e}")
+    
+    return failed
+
+
+def resolve_regions(names):
+    """Matchar regionnamn mot kända regioner (skiftlägesokänsligt)"""
+    known = {name.lower(): name for name in BASE_PRICES}
+    regions = []
+    for name in names:
+        region = known.get(name.strip().lower())
+        if region is None:
+            print(f"⚠️ Okänd region '{name}' hoppas över")
+        elif region not in regions:
+            regions.append(region)
+    return regions
+
+
 def main():
     print("\n" + "="*60)
     print("🚀 SWEDISH HOUSING STATS - PRODUCTION VERSION")
@@ -361,18 +444,20 @@ def main():
         print("❌ Telegram credentials saknas!")
         return
     
-    # 1. Hämta data
-    housing_data = fetch_housing_data()
-    
-    # 2. Skapa avancerad graf
-    import numpy as np
-    graph_path, graph_type = generate_random_graph(housing_data, OUTPUT_DIR)
-    
-    # 3. Generera engagerande tweet
-    tweet = generate_engaging_tweet(housing_data)
+    # Regioner från kommandoraden eller HOUSING_REGIONS, annars en slumpad
+    requested = sys.argv[1:] or HOUSING_REGIONS
+    regions = resolve_regions(requested) if requested else [None]
+    if not regions:
+        print(f"❌ Inga kända regioner angivna (välj bland {', '.join(BASE_PRICES)})")
+        return
     
-    # 4. Skicka till Telegram
-    asyncio.run(send_telegram_notification(graph_path, tweet))
+    metrics.start_run("konto1")
+    status = "error"
+    try:
+        failed = asyncio.run(run_pipeline(regions))
+        status = "ok" if failed == 0 else "partial"
+    finally:
+        metrics.finish_run(status)
     
     print("\n" + "="*60)
     print("✅ KLART! Kolla Telegram för preview")
@@ -380,4 +465,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    metrics.run_profiled(main)
\ No newline at end of file
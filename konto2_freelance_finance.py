@@ -8,6 +8,7 @@ from datetime import datetime
 from dotenv import load_dotenv
 import asyncio
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from tts_stage import synthesize
 
 load_dotenv()
 
@@ -33,6 +34,14 @@ async def main():
         reply_markup=reply_markup
     )
     
+    # Narration (cachad - samma ämne syntetiseras bara en gång)
+    try:
+        audio_path = await synthesize(topic)
+        with open(audio_path, 'rb') as audio:
+            await bot.send_audio(chat_id=os.getenv("TELEGRAM_CHAT_ID"), audio=audio, title=topic)
+    except Exception as e:
+        print(f"⚠️ TTS-fel: {e}")
+    
     print("✅ Skickat till Telegram!\n")
 
 if __name__ == "__main__":
@@ -7,9 +7,12 @@ from datetime import datetime
 from dotenv import load_dotenv
 import asyncio
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from tts_stage import synthesize
 
 load_dotenv()
 
+NARRATION = "Veckans nordiska startups: vilka som tog in kapital och vad de bygger."
+
 async def main():
     print("\n🚀 NORDIC STARTUPS - Placeholder\n")
     
@@ -24,6 +27,14 @@ async def main():
         reply_markup=reply_markup
     )
     
+    # Narration (cachad - samma manus syntetiseras bara en gång)
+    try:
+        audio_path = await synthesize(NARRATION)
+        with open(audio_path, 'rb') as audio:
+            await bot.send_audio(chat_id=os.getenv("TELEGRAM_CHAT_ID"), audio=audio, title="Nordic Startups")
+    except Exception as e:
+        print(f"⚠️ TTS-fel: {e}")
+    
     print("✅ Skickat till Telegram!\n")
 
 if __name__ == "__main__":
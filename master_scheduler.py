@@ -1,30 +1,171 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""MASTER SCHEDULER"""
+"""MASTER SCHEDULER
 
+Användning:
+    python master_scheduler.py          # starta schemat
+    python master_scheduler.py status [-v]   # senaste körning per jobb
+"""
+
+import os
+import json
+import logging
 import schedule
 import time
 import subprocess
 import sys
+import threading
+from collections import deque
 from datetime import datetime
+from logging.handlers import RotatingFileHandler
 
 PYTHON_EXE = sys.executable
+JOB_TIMEOUT = 600
+LOG_DIR = "logs"
+METRICS_FILE = f"{LOG_DIR}/job_metrics.jsonl"
+STATUS_FILE = f"{LOG_DIR}/job_status.json"
+TAIL_LINES = 50           # sparas i job_status.json för senaste körningen
+
+
+def get_job_logger(script_name):
+    """Roterande loggfil per jobb: logs/<jobb>.log"""
+    job = os.path.splitext(os.path.basename(script_name))[0]
+    logger = logging.getLogger(f"job.{job}")
+    if not logger.handlers:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        handler = RotatingFileHandler(f"{LOG_DIR}/{job}.log", maxBytes=1_000_000,
+                                      backupCount=5, encoding='utf-8')
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def _pump(stream, prefix, logger, tail):
+    """Läser barnprocessens output rad för rad och skriver ut direkt"""
+    for line in stream:
+        line = line.rstrip("\n")
+        print(f"{prefix}{line}", flush=True)
+        logger.info(f"{prefix}{line}")
+        tail.append(f"{prefix}{line}")
+    stream.close()
+
+
+def _wait(proc):
+    """Väntar på processen och returnerar (exit code, max RSS i KB)"""
+    if hasattr(os, "wait4"):
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        rss = rusage.ru_maxrss
+        # macOS rapporterar bytes, Linux KB
+        return proc.returncode, rss // 1024 if sys.platform == "darwin" else rss
+    return proc.wait(), None
+
+
+def record_job_metrics(entry, tail):
+    """
+    Lägger till i metrics-loggen och uppdaterar status-filen. Output-svansen
+    sparas bara i status-filen (senaste körningen per jobb).
+    """
+    os.makedirs(LOG_DIR, exist_ok=True)
+    with open(METRICS_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    status = load_status()
+    status[entry["job"]] = {**entry, "last_lines": list(tail)}
+    tmp_file = f"{STATUS_FILE}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(status, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, STATUS_FILE)
+
+
+def load_status():
+    if not os.path.exists(STATUS_FILE):
+        return {}
+    with open(STATUS_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
 
 def run_script(script_name):
     print(f"\n{'='*60}")
     print(f"🚀 Kör: {script_name}")
     print(f"⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*60}\n")
-    
+
+    logger = get_job_logger(script_name)
+    logger.info(f"=== Start: {script_name} ===")
+    tail = deque(maxlen=TAIL_LINES)
+    started_at = datetime.now()
+    start = time.monotonic()
+    exit_code, max_rss_kb, timed_out = None, None, False
+
     try:
-        result = subprocess.run([PYTHON_EXE, script_name], capture_output=True, text=True, timeout=600)
-        print(result.stdout)
-        if result.returncode == 0:
+        proc = subprocess.Popen(
+            [PYTHON_EXE, "-u", script_name],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, encoding='utf-8', errors='replace', bufsize=1
+        )
+        readers = [
+            threading.Thread(target=_pump, args=(proc.stdout, "", logger, tail), daemon=True),
+            threading.Thread(target=_pump, args=(proc.stderr, "[stderr] ", logger, tail), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+
+        def kill_on_timeout():
+            nonlocal timed_out
+            timed_out = True
+            proc.kill()
+
+        watchdog = threading.Timer(JOB_TIMEOUT, kill_on_timeout)
+        watchdog.start()
+        try:
+            exit_code, max_rss_kb = _wait(proc)
+        finally:
+            watchdog.cancel()
+        for reader in readers:
+            reader.join(timeout=5)
+
+        if timed_out:
+            print(f"❌ {script_name} avbröts efter {JOB_TIMEOUT}s")
+        elif exit_code == 0:
             print(f"✅ {script_name} lyckades")
         else:
             print(f"❌ {script_name} misslyckades")
     except Exception as e:
         print(f"❌ Fel: {e}")
+        tail.append(f"[scheduler] {e}")
+
+    duration = time.monotonic() - start
+    logger.info(f"=== Slut: {script_name} exit={exit_code} {duration:.1f}s ===")
+    record_job_metrics({
+        "job": script_name,
+        "started_at": started_at.isoformat(),
+        "duration_s": round(duration, 2),
+        "exit_code": exit_code,
+        "timed_out": timed_out,
+        "max_rss_kb": max_rss_kb,
+    }, tail)
+
+
+def print_status(verbose=False):
+    """Tabell per jobb; output-svansen visas för misslyckade jobb (alla med -v)"""
+    status = load_status()
+    if not status:
+        print(f"⚠️ Inga körningar registrerade i {STATUS_FILE}")
+        return
+
+    print(f"\n{'Jobb':<32}{'Senast':<22}{'Tid':>8}{'Exit':>6}{'RSS MB':>9}")
+    for job, entry in sorted(status.items()):
+        started = entry["started_at"][:19].replace("T", " ")
+        rss = f"{entry['max_rss_kb'] / 1024:.0f}" if entry.get("max_rss_kb") else "-"
+        exit_code = "T/O" if entry.get("timed_out") else entry.get("exit_code")
+        print(f"{job:<32}{started:<22}{entry['duration_s']:>7.1f}s{str(exit_code):>6}{rss:>9}")
+        if verbose or entry.get("exit_code") != 0:
+            for line in entry.get("last_lines", []):
+                print(f"    {line}")
+
 
 # Schema
 schedule.every().day.at("19:53").do(run_script, "konto1_housing_stats.py")
@@ -32,14 +173,18 @@ schedule.every().day.at("08:00").do(run_script, "konto2_freelance_finance.py")
 schedule.every().day.at("18:00").do(run_script, "konto3_nordic_startups.py")
 schedule.every().sunday.at("10:00").do(run_script, "konto4_remote_jobs.py")
 schedule.every().monday.at("12:00").do(run_script, "konto5_hidden_sweden.py")
+schedule.every().day.at("03:30").do(run_script, "retention.py")
 
 def main():
     print("\n⏰ MASTER SCHEDULER STARTAD")
     print("Tryck Ctrl+C för att stoppa\n")
-    
+
     while True:
         schedule.run_pending()
         time.sleep(60)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        print_status(verbose="-v" in sys.argv)
+    else:
+        main()
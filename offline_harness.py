@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline Harness - Lokala stand-ins för SCB, HuggingFace, Telegram och Twitter
+
+Användning:
+    python offline_harness.py serve [--mode synthetic|record|replay] [--allow-writes]
+    python offline_harness.py loadtest --runs 50 --concurrency 5 \\
+        [--latency-ms 80] [--jitter-ms 40] [--failure-rate 0.05] [--mode replay]
+
+synthetic: servrarna svarar med genererade svar (ingen nätverksåtkomst)
+record:    servrarna proxar läsanrop till riktiga API:er och sparar svaren.
+           Skrivande anrop (tweets, Telegram send*) besvaras syntetiskt
+           om inte --allow-writes anges. Record fungerar bara med serve.
+replay:    servrarna spelar upp sparade svar från data/cassettes/
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CASSETTE_DIR = "data/cassettes"
+
+# Riktiga API:er som stand-ins ersätter (används vid record)
+UPSTREAMS = {
+    "scb": "https://api.scb.se",
+    "huggingface": "https://api-inference.huggingface.co",
+    "telegram": "https://api.telegram.org",
+    "twitter": "https://api.twitter.com",
+}
+
+REGIONS = ['Stockholm', 'Göteborg', 'Malmö', 'Riket']
+
+# Telegram-metoder som skapar eller ändrar meddelanden
+_TELEGRAM_WRITE_PREFIXES = ("send", "edit", "delete", "forward", "copy", "pin")
+
+
+class Cassette:
+    """Sparade svar per tjänst, nyckel = metod + path (utan bot-token)"""
+
+    def __init__(self, service):
+        self.path = f"{CASSETTE_DIR}/{service}.jsonl"
+        self.entries = {}
+        self.cursor = {}
+        self.lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries.setdefault(entry["key"], []).append(entry)
+
+    def record(self, key, status, body):
+        entry = {"key": key, "status": status, "body": body}
+        with self.lock:
+            self.entries.setdefault(key, []).append(entry)
+            os.makedirs(CASSETTE_DIR, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def replay(self, key):
+        """Spelar upp inspelade svar i tur och ordning (round-robin)"""
+        with self.lock:
+            entries = self.entries.get(key)
+            if not entries:
+                return None
+            i = self.cursor.get(key, 0)
+            self.cursor[key] = i + 1
+            return entries[i % len(entries)]
+
+
+class FakeService:
+    """Konfiguration och räknare för en stand-in"""
+
+    def __init__(self, name, mode="synthetic", latency_ms=0, jitter_ms=0, failure_rate=0.0, seed=None,
+                 allow_writes=False):
+        self.name = name
+        self.mode = mode
+        self.allow_writes = allow_writes
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.cassette = Cassette(name)
+        self.requests = 0
+        self.failures = 0
+        self.next_id = 1000
+        self.lock = threading.Lock()
+
+    def next_message_id(self):
+        with self.lock:
+            self.next_id += 1
+            return self.next_id
+
+
+def is_write_request(service, method, path):
+    """Anrop som publicerar något på riktigt om de proxas vidare"""
+    if service.name == "twitter":
+        return method == "POST"
+    if service.name == "telegram":
+        endpoint = path.split("?")[0].rstrip("/").split("/")[-1]
+        return endpoint.startswith(_TELEGRAM_WRITE_PREFIXES)
+    return False
+
+
+def request_key(method, path):
+    # Bot-token ska varken sparas eller påverka matchningen
+    parts = path.split("?")[0].split("/")
+    parts = ["bot<token>" if p.startswith("bot") and ":" in p else p for p in parts]
+    return f"{method} {'/'.join(parts)}"
+
+
+def synthetic_response(service, path, body):
+    """Svar som efterliknar respektive API tillräckligt för konto1"""
+    now = int(time.time())
+
+    if service.name == "scb":
+        return 200, {"columns": [], "comments": [], "data": []}
+
+    if service.name == "huggingface":
+        text = (f"📈 Bostadspriserna fortsätter att röra sig! "
+                f"Följ utvecklingen med oss. #bostad #fastighet ({service.rng.randint(1, 999)})")
+        return 200, [{"generated_text": text}]
+
+    if service.name == "telegram":
+        method = path.split("?")[0].rstrip("/").split("/")[-1]
+        if method == "getMe":
+            return 200, {"ok": True, "result": {
+                "id": 1, "is_bot": True, "first_name": "Offline", "username": "offline_bot"}}
+        return 200, {"ok": True, "result": {
+            "message_id": service.next_message_id(),
+            "date": now,
+            "chat": {"id": 1, "type": "private"},
+        }}
+
+    if service.name == "twitter":
+        media_id = service.next_message_id()
+        if "/media/upload" in path:
+            return 200, {"media_id": media_id, "media_id_string": str(media_id)}
+        return 201, {"data": {"id": str(10**18 + media_id), "text": ""}}
+
+    return 404, {"error": "unknown service"}
+
+
+def forward_upstream(service, method, path, headers, body):
+    import requests
+
+    base = UPSTREAMS[service.name]
+    if service.name == "twitter" and "/media/upload" in path:
+        base = "https://upload.twitter.com"
+    skip = {"host", "content-length", "connection", "accept-encoding"}
+    response = requests.request(method, base + path, data=body, timeout=30,
+                                headers={k: v for k, v in headers.items() if k.lower() not in skip})
+    try:
+        return response.status_code, response.json()
+    except ValueError:
+        return response.status_code, {"raw": response.text}
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _handle(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+
+            with service.lock:
+                service.requests += 1
+
+            delay = service.latency_ms + service.rng.uniform(0, service.jitter_ms)
+            if delay:
+                time.sleep(delay / 1000)
+
+            if service.rng.random() < service.failure_rate:
+                with service.lock:
+                    service.failures += 1
+                status, payload = 503, {"ok": False, "error": "injected failure"}
+            else:
+                key = request_key(self.command, self.path)
+                if service.mode == "record" and not service.allow_writes and \
+                        is_write_request(service, self.command, self.path):
+                    print(f"🛑 {service.name}: {key} proxas inte (--allow-writes saknas)")
+                    status, payload = synthetic_response(service, self.path, body)
+                elif service.mode == "record":
+                    status, payload = forward_upstream(service, self.command, self.path,
+                                                       dict(self.headers), body)
+                    service.cassette.record(key, status, payload)
+                else:
+                    entry = service.cassette.replay(key) if service.mode == "replay" else None
+                    if entry:
+                        status, payload = entry["status"], entry["body"]
+                    else:
+                        status, payload = synthetic_response(service, self.path, body)
+
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = _handle
+        do_POST = _handle
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_fake_servers(mode="synthetic", latency_ms=0, jitter_ms=0, failure_rate=0.0, seed=None,
+                       allow_writes=False):
+    """
+    Startar en lokal server per tjänst och returnerar (services, env)
+    där env innehåller de miljövariabler som pekar konto1 mot dem.
+    """
+    services = {}
+    ports = {}
+    for name in UPSTREAMS:
+        service = FakeService(name, mode, latency_ms, jitter_ms, failure_rate,
+                              None if seed is None else f"{seed}-{name}", allow_writes)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        services[name] = service
+        ports[name] = server.server_address[1]
+
+    env = {
+        "SCB_API_URL": f"http://127.0.0.1:{ports['scb']}/OV0104/v1/doris/sv/ssd/START/BO/BO0104/BO0104D/BO0104T04",
+        "HF_API_URL": f"http://127.0.0.1:{ports['huggingface']}/models/mistralai/Mistral-7B-Instruct-v0.2",
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{ports['telegram']}/bot",
+        "TWITTER_API_URL": f"http://127.0.0.1:{ports['twitter']}",
+    }
+    if mode != "record":
+        env.update({
+            "TELEGRAM_BOT_TOKEN": "123456:offline",
+            "TELEGRAM_CHAT_ID": "1",
+            "HUGGINGFACE_TOKEN": "offline",
+            "TWITTER_API_KEY": "offline",
+            "TWITTER_API_SECRET": "offline",
+            "TWITTER_ACCESS_TOKEN": "offline",
+            "TWITTER_ACCESS_SECRET": "offline",
+        })
+    return services, env
+
+
+async def run_load_test(runs, concurrency, post_twitter=True):
+    """Kör N simulerade konto1-körningar mot stand-ins"""
+    from concurrent.futures import ProcessPoolExecutor
+    import konto1_housing_stats as konto1
+    import posting_functions
+    import pipeline_metrics as metrics
+    import resilience
+
+    # Håll genererade filer och breaker-tillstånd borta från repo-katalogerna
+    workdir = tempfile.mkdtemp(prefix="offline_harness_")
+    resilience.STATE_FILE = f"{workdir}/circuit_breakers.json"
+    konto1.OUTPUT_DIR = f"{workdir}/images"
+    konto1.DATA_DIR = f"{workdir}/processed"
+    os.makedirs(konto1.OUTPUT_DIR, exist_ok=True)
+    os.makedirs(konto1.DATA_DIR, exist_ok=True)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def one_run(i, render_pool):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                metadata_file = await konto1.process_region(REGIONS[i % len(REGIONS)], render_pool)
+                if post_twitter:
+                    with open(metadata_file, encoding='utf-8') as f:
+                        metadata = json.load(f)
+                    with metrics.stage("twitter"):
+                        tweet_id = await asyncio.to_thread(posting_functions.post_to_twitter,
+                                                           metadata["image_path"], metadata["caption"])
+                    # post_to_twitter fångar sina egna fel och returnerar då None
+                    if tweet_id is None:
+                        raise RuntimeError("Twitter-posten misslyckades")
+            except Exception as e:
+                failures += 1
+                print(f"❌ Körning {i} misslyckades: {e}")
+            latencies.append(time.perf_counter() - start)
+
+    metrics.start_run("konto1_loadtest")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=min(concurrency, os.cpu_count() or 1)) as render_pool:
+        await asyncio.gather(*(one_run(i, render_pool) for i in range(runs)))
+    elapsed = time.perf_counter() - start
+    record = metrics.finish_run("ok" if failures == 0 else "partial")
+
+    return {
+        "runs": runs,
+        "failures": failures,
+        "elapsed_s": elapsed,
+        "throughput": runs / elapsed if elapsed else 0.0,
+        "p50_s": metrics.percentile(latencies, 50),
+        "p95_s": metrics.percentile(latencies, 95),
+        "p99_s": metrics.percentile(latencies, 99),
+        "stages": metrics.build_report([record]) if record else {},
+    }
+
+
+def print_load_report(result, services):
+    print("\n" + "="*60)
+    print("📊 LOADTEST-RESULTAT")
+    print("="*60)
+    print(f"Körningar:     {result['runs']} ({result['failures']} misslyckade)")
+    print(f"Total tid:     {result['elapsed_s']:.2f}s")
+    print(f"Genomströmning: {result['throughput']:.2f} körningar/s")
+    print(f"Latens:        p50 {result['p50_s']:.3f}s  p95 {result['p95_s']:.3f}s  p99 {result['p99_s']:.3f}s")
+
+    print(f"\n{'Steg':<28}{'p50 ms':>10}{'p95 ms':>10}")
+    for key, row in result["stages"].items():
+        if key.startswith("stage:") or key.startswith("http:"):
+            print(f"{key:<28}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}")
+
+    print(f"\n{'Stand-in':<16}{'anrop':>8}{'injicerade fel':>16}")
+    for name, service in services.items():
+        print(f"{name:<16}{service.requests:>8}{service.failures:>16}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokala stand-ins och loadtest för konto1")
+    parser.add_argument("command", choices=["serve", "loadtest"])
+    parser.add_argument("--mode", choices=["synthetic", "record", "replay"], default="synthetic")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=25)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-twitter", action="store_true", help="hoppa över Twitter-steget")
+    parser.add_argument("--allow-writes", action="store_true",
+                        help="record: proxa även tweets och Telegram-meddelanden till riktiga API:er")
+    args = parser.parse_args()
+
+    # Record använder riktiga nycklar - en loadtest skulle posta på riktigt
+    if args.command == "loadtest" and args.mode == "record":
+        parser.error("loadtest kan inte köras med --mode record (använd serve)")
+
+    services, env = start_fake_servers(args.mode, args.latency_ms, args.jitter_ms,
+                                       args.failure_rate, args.seed, args.allow_writes)
+
+    if args.command == "serve":
+        print(f"\n🧪 Stand-ins startade ({args.mode}). Exportera:\n")
+        for key, value in env.items():
+            print(f"{key}={value}")
+        print("\nTryck Ctrl+C för att stoppa")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return
+
+    # Miljön måste sättas innan konto1 importeras (läser den vid import)
+    os.environ.update(env)
+    print(f"\n🧪 Loadtest: {args.runs} körningar, concurrency {args.concurrency}, "
+          f"latens {args.latency_ms}±{args.jitter_ms}ms, felgrad {args.failure_rate:.0%}\n")
+    result = asyncio.run(run_load_test(args.runs, args.concurrency, not args.no_twitter))
+    print_load_report(result, services)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
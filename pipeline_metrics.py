@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pipeline Metrics - Tidtagning per steg, HTTP-anrop och minne
+
+Användning:
+    python pipeline_metrics.py report [job]   # p50/p95 per steg
+"""
+
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+METRICS_DIR = "data/metrics"
+PROFILE_MODE = os.getenv("PROFILE_MODE")  # "cprofile" eller "pyinstrument"
+
+_active_run = None
+
+
+class RunMetrics:
+    """Samlar stegtider och HTTP-tider för en körning"""
+
+    def __init__(self, job):
+        self.job = job
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.stages = []
+        self.http_calls = []
+        self.short_circuits = []
+
+    @contextmanager
+    def stage(self, name, **labels):
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.stages.append({
+                "name": name,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                "status": status,
+                **labels,
+            })
+
+    @contextmanager
+    def http(self, endpoint):
+        start = time.perf_counter()
+        call = {"endpoint": endpoint, "status": None}
+        try:
+            yield call
+        except BaseException:
+            call["status"] = "error"
+            raise
+        finally:
+            call["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            # Anrop som circuit breakern stoppade skickades aldrig och
+            # hålls utanför latensserien
+            if call["status"] == "short-circuit":
+                self.short_circuits.append(endpoint)
+            else:
+                self.http_calls.append(call)
+
+    def to_record(self, status):
+        # Grafrenderingen körs i en process-pool, så barnprocesserna räknas med
+        self_rss = peak_rss_kb()
+        children_rss = peak_rss_kb(children=True)
+        return {
+            "job": self.job,
+            "started_at": self.started_at.isoformat(),
+            "status": status,
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 2),
+            "peak_rss_kb": max(filter(None, (self_rss, children_rss)), default=None),
+            "peak_rss_self_kb": self_rss,
+            "peak_rss_children_kb": children_rss,
+            "stages": self.stages,
+            "http": self.http_calls,
+            "short_circuits": self.short_circuits,
+        }
+
+
+def peak_rss_kb(children=False):
+    """
+    Max RSS i KB för processen, eller för den största avslutade
+    barnprocessen med children=True (None där resource saknas)
+    """
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    rss = resource.getrusage(who).ru_maxrss
+    # macOS rapporterar bytes, Linux KB
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def start_run(job):
+    global _active_run
+    _active_run = RunMetrics(job)
+    return _active_run
+
+
+def finish_run(status="ok"):
+    """Skriver körningen som en JSON-rad till data/metrics/<job>.jsonl"""
+    global _active_run
+    run, _active_run = _active_run, None
+    if run is None:
+        return None
+
+    record = run.to_record(status)
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with open(f"{METRICS_DIR}/{run.job}.jsonl", 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    print(f"⏱️ Körning klar på {record['total_ms'] / 1000:.2f}s "
+          f"(peak RSS: {record['peak_rss_kb']} KB)")
+    return record
+
+
+@contextmanager
+def stage(name, **labels):
+    """Tidtar ett pipeline-steg i aktiv körning (no-op utan aktiv körning)"""
+    if _active_run is None:
+        yield
+        return
+    with _active_run.stage(name, **labels):
+        yield
+
+
+@contextmanager
+def http(endpoint):
+    """
+    Tidtar ett HTTP-anrop. Sätt call['status'] till statuskoden, eller
+    "short-circuit" om anropet aldrig skickades.
+    """
+    if _active_run is None:
+        yield {}
+        return
+    with _active_run.http(endpoint) as call:
+        yield call
+
+
+def percentile(values, pct):
+    """Percentil med linjär interpolation"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def load_runs(job):
+    path = f"{METRICS_DIR}/{job}.jsonl"
+    if not os.path.exists(path):
+        return []
+    runs = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                runs.append(json.loads(line))
+    return runs
+
+
+def build_report(runs):
+    """Aggregerar körningar till p50/p95 per steg och HTTP-endpoint"""
+    series = {"total": [r["total_ms"] for r in runs]}
+    short_circuits = {}
+    for r in runs:
+        for endpoint in r.get("short_circuits", []):
+            short_circuits[endpoint] = short_circuits.get(endpoint, 0) + 1
+        for s in r.get("stages", []):
+            series.setdefault(f"stage:{s['name']}", []).append(s["duration_ms"])
+        for h in r.get("http", []):
+            series.setdefault(f"http:{h['endpoint']}", []).append(h["duration_ms"])
+
+    report = {}
+    for key, values in series.items():
+        report[key] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "max_ms": round(max(values), 2),
+        }
+
+    rss = [r["peak_rss_kb"] for r in runs if r.get("peak_rss_kb")]
+    if rss:
+        report["peak_rss_kb"] = {"p50": percentile(rss, 50), "max": max(rss)}
+    if short_circuits:
+        report["short_circuits"] = short_circuits
+    return report
+
+
+def print_report(job):
+    runs = load_runs(job)
+    if not runs:
+        print(f"⚠️ Inga mätningar för {job} i {METRICS_DIR}/")
+        return
+
+    report = build_report(runs)
+    print(f"\n📊 {job}: {len(runs)} körningar\n")
+    print(f"{'Mätpunkt':<32}{'antal':>7}{'p50 ms':>12}{'p95 ms':>12}{'max ms':>12}")
+    for key, row in report.items():
+        if key in ("peak_rss_kb", "short_circuits"):
+            continue
+        print(f"{key:<32}{row['count']:>7}{row['p50_ms']:>12.1f}{row['p95_ms']:>12.1f}{row['max_ms']:>12.1f}")
+    if "peak_rss_kb" in report:
+        print(f"\nPeak RSS: p50 {report['peak_rss_kb']['p50']:.0f} KB, "
+              f"max {report['peak_rss_kb']['max']} KB")
+    for endpoint, count in report.get("short_circuits", {}).items():
+        print(f"⚡ {endpoint}: {count} anrop stoppade av circuit breakern")
+
+
+def run_profiled(func, mode=None):
+    """
+    Kör func() under cProfile eller pyinstrument (opt-in via PROFILE_MODE)
+    """
+    mode = mode or PROFILE_MODE
+    if not mode:
+        return func()
+
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("⚠️ pyinstrument saknas, använder cProfile")
+            mode = "cprofile"
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                return func()
+            finally:
+                profiler.stop()
+                path = f"{METRICS_DIR}/profile_{timestamp}.html"
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+                print(f"🔬 Profil sparad: {path}")
+
+    if mode != "cprofile":
+        print(f"⚠️ Okänt PROFILE_MODE: {mode}")
+        return func()
+
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func)
+    finally:
+        path = f"{METRICS_DIR}/profile_{timestamp}.prof"
+        profiler.dump_stats(path)
+        print(f"🔬 Profil sparad: {path} (öppna med snakeviz eller pstats)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "report":
+        print_report(sys.argv[2] if len(sys.argv) > 2 else "konto1")
+    else:
+        print(__doc__)
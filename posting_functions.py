@@ -6,10 +6,35 @@ Posting Functions - Hanterar auto-posting till alla plattformar
 
 import os
 import tweepy
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Pekar om Twitter-anrop till en lokal stand-in (se offline_harness.py)
+TWITTER_API_URL = os.getenv("TWITTER_API_URL")
+
+
+class _RedirectAdapter(HTTPAdapter):
+    """Skriver om api/upload.twitter.com till en annan bas-URL"""
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url.rstrip('/')
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.url = self.base_url + parts.path + (f"?{parts.query}" if parts.query else "")
+        return super().send(request, **kwargs)
+
+
+def _redirect_session(session):
+    if TWITTER_API_URL:
+        adapter = _RedirectAdapter(TWITTER_API_URL)
+        session.mount("https://api.twitter.com/", adapter)
+        session.mount("https://upload.twitter.com/", adapter)
+
 
 def post_to_twitter(image_path, caption):
     """
@@ -44,6 +69,8 @@ def post_to_twitter(image_path, caption):
             os.getenv("TWITTER_ACCESS_SECRET")
         )
         api = tweepy.API(auth)
+        _redirect_session(client.session)
+        _redirect_session(api.session)
         
         # Ladda upp media
         media = api.media_upload(filename=image_path)
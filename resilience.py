@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resilience - Circuit breakers, adaptiva timeouts och hedged requests
+
+Tillståndet per endpoint sparas i data/state/circuit_breakers.json så att
+en nere tjänst inte kostar full timeout vid varje ny körning. Jobben körs
+dagligen eller några gånger i veckan, så breakern hålls öppen i timmar och
+tiden fördubblas efter varje misslyckat provanrop (upp till MAX_OPEN_SECONDS).
+
+Användning:
+    python resilience.py            # visa status per endpoint
+    python resilience.py reset scb  # stäng en breaker manuellt
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from pipeline_metrics import percentile
+
+STATE_FILE = "data/state/circuit_breakers.json"
+FAILURE_THRESHOLD = 3      # fel i rad innan breakern öppnar
+OPEN_SECONDS = 6 * 3600    # hur länge breakern är öppen innan första provanropet
+MAX_OPEN_SECONDS = 72 * 3600  # tak för fördubblingen efter misslyckade provanrop
+LATENCY_WINDOW = 50        # antal senaste lyckade latenser som sparas
+MIN_SAMPLES = 5            # latenser som krävs för adaptiv timeout/hedging
+TIMEOUT_FACTOR = 3.0       # timeout = p95 * faktor
+
+_lock = threading.Lock()
+_state = None
+_trials = set()  # endpoints med ett pågående provanrop (half-open)
+_local = threading.local()  # utfallet av trådens senaste call()
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+def _load_state():
+    global _state
+    if _state is None:
+        _state = {}
+        if os.path.exists(STATE_FILE):
+            try:
+                with open(STATE_FILE, encoding='utf-8') as f:
+                    _state = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Kunde inte läsa {STATE_FILE}: {e}")
+    return _state
+
+
+def _save_state():
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    tmp_file = f"{STATE_FILE}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(_state, f, indent=2)
+    os.replace(tmp_file, STATE_FILE)
+
+
+def _endpoint(name):
+    return _load_state().setdefault(name, {
+        "state": "closed",
+        "failures": 0,
+        "opened_at": None,
+        "open_seconds": OPEN_SECONDS,
+        "latencies": [],
+    })
+
+
+def adaptive_timeout(ep, max_timeout, min_timeout):
+    """p95 av senaste latenser * faktor, begränsad till [min, max]"""
+    if len(ep["latencies"]) < MIN_SAMPLES:
+        return max_timeout
+    p95 = percentile(ep["latencies"], 95)
+    return max(min_timeout, min(max_timeout, p95 * TIMEOUT_FACTOR))
+
+
+def hedge_delay(ep):
+    """Skicka en andra request om den första inte svarat efter p95"""
+    if len(ep["latencies"]) < MIN_SAMPLES:
+        return None
+    return percentile(ep["latencies"], 95)
+
+
+def _is_failure(response):
+    return response.status_code >= 500 or response.status_code == 429
+
+
+def _hedged(request_fn, timeout, delay):
+    """
+    Kör request_fn och startar en andra efter `delay` sekunder om den
+    första inte svarat. Första lyckade svaret vinner.
+    """
+    futures = [_hedge_pool.submit(request_fn, timeout)]
+    done, _ = wait(futures, timeout=delay)
+    if not done:
+        futures.append(_hedge_pool.submit(request_fn, timeout))
+
+    error = None
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response = future.result()
+            except Exception as e:
+                error = e
+                continue
+            if not _is_failure(response) or not pending:
+                return response
+    raise error
+
+
+def last_outcome():
+    """
+    Utfallet av trådens senaste call(): "ok", "error" eller "short-circuit"
+    (breakern släppte inte igenom anropet, inget skickades)
+    """
+    return getattr(_local, "outcome", None)
+
+
+def call(name, request_fn, max_timeout, min_timeout=1.0, hedge=False):
+    """
+    Anropar request_fn(timeout) genom endpointens circuit breaker.
+
+    Returnerar response, eller None om breakern är öppen eller anropet
+    misslyckades - anroparen tar då sin fallback direkt. Vilket av dem
+    det blev går att läsa med last_outcome().
+    """
+    _local.outcome = "short-circuit"
+    with _lock:
+        ep = _endpoint(name)
+        if ep["state"] in ("open", "half-open"):
+            if ep["state"] == "open" and \
+                    time.time() - ep["opened_at"] < ep.get("open_seconds", OPEN_SECONDS):
+                print(f"⚡ {name}: circuit breaker öppen, hoppar över anropet")
+                return None
+            if name in _trials:
+                print(f"⚡ {name}: provanrop pågår, hoppar över anropet")
+                return None
+            # Släpp igenom ett enda provanrop, övriga tar sin fallback
+            ep["state"] = "half-open"
+            _trials.add(name)
+        timeout = adaptive_timeout(ep, max_timeout, min_timeout)
+        delay = hedge_delay(ep) if hedge else None
+
+    start = time.perf_counter()
+    response, error = None, None
+    try:
+        if delay is not None:
+            response = _hedged(request_fn, timeout, delay)
+        else:
+            response = request_fn(timeout)
+    except Exception as e:
+        error = e
+    elapsed = time.perf_counter() - start
+
+    with _lock:
+        _trials.discard(name)
+        ep = _endpoint(name)
+        if error is None and not _is_failure(response):
+            ep["state"] = "closed"
+            ep["failures"] = 0
+            ep["opened_at"] = None
+            ep["open_seconds"] = OPEN_SECONDS
+            ep["latencies"] = (ep["latencies"] + [round(elapsed, 4)])[-LATENCY_WINDOW:]
+        else:
+            ep["failures"] += 1
+            if ep["state"] == "half-open" or ep["failures"] >= FAILURE_THRESHOLD:
+                open_seconds = ep.get("open_seconds", OPEN_SECONDS)
+                if ep["state"] == "half-open":
+                    # Misslyckat provanrop: vänta dubbelt så länge nästa gång
+                    open_seconds = min(open_seconds * 2, MAX_OPEN_SECONDS)
+                if ep["state"] != "open":
+                    print(f"⚡ {name}: circuit breaker öppnas i {open_seconds / 3600:g}h")
+                ep["state"] = "open"
+                ep["open_seconds"] = open_seconds
+                ep["opened_at"] = time.time()
+        _save_state()
+
+    if error is not None:
+        _local.outcome = "error"
+        print(f"⚠️ {name}: {error} (timeout {timeout:.1f}s)")
+        return None
+    _local.outcome = "error" if _is_failure(response) else "ok"
+    return response
+
+
+def print_status():
+    state = _load_state()
+    if not state:
+        print(f"⚠️ Inget sparat tillstånd i {STATE_FILE}")
+        return
+
+    print(f"\n{'Endpoint':<16}{'Tillstånd':<12}{'Fel':>5}{'Öppen h':>9}{'p50 s':>9}{'p95 s':>9}")
+    for name, ep in sorted(state.items()):
+        p50 = percentile(ep["latencies"], 50)
+        p95 = percentile(ep["latencies"], 95)
+        p50 = f"{p50:.2f}" if p50 is not None else "-"
+        p95 = f"{p95:.2f}" if p95 is not None else "-"
+        open_h = f"{ep.get('open_seconds', OPEN_SECONDS) / 3600:g}" if ep["state"] != "closed" else "-"
+        print(f"{name:<16}{ep['state']:<12}{ep['failures']:>5}{open_h:>9}{p50:>9}{p95:>9}")
+
+
+def reset(name):
+    with _lock:
+        _load_state().pop(name, None)
+        _save_state()
+    print(f"✅ {name}: circuit breaker återställd")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "reset":
+        reset(sys.argv[2])
+    else:
+        print_status()
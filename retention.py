@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Retention - Städar genererade filer och packar gammal metadata
+
+Bilder, videor och ljud rensas efter ålder och total storlek, men filer som
+refereras av publicerade poster sparas alltid. Gammal metadata-JSON
+packas in i ett gzip-arkiv i stället för att ligga kvar som lösa filer.
+
+Körs inkrementellt: inventeringen per katalog sparas i
+data/state/retention.json och en katalog läses bara om när dess mtime
+har ändrats.
+
+Användning:
+    python retention.py [--dry-run]
+"""
+
+import os
+import re
+import sys
+import json
+import gzip
+from datetime import datetime, timedelta
+
+from caption_templates import RECENT_HISTORY
+
+STATE_FILE = "data/state/retention.json"
+ARCHIVE_FILE = "data/archive/metadata.jsonl.gz"
+
+POLICIES = {
+    "generated/images": {"max_age_days": 30, "max_total_mb": 200},
+    "generated/videos": {"max_age_days": 14, "max_total_mb": 1000},
+    "generated/audio": {"max_age_days": 30, "max_total_mb": 300},
+    "data/processed": {"max_age_days": 14, "archive": True},
+    # Caption-motorn läser de senaste posterna härifrån (se caption_templates.py)
+    "published": {"max_age_days": 90, "archive": True, "keep_latest": RECENT_HISTORY},
+}
+
+_TIMESTAMP_RE = re.compile(r"(\d{8}_\d{6})")
+
+
+def load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    return {"dirs": {}, "referenced": []}
+
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    tmp_file = f"{STATE_FILE}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_file, STATE_FILE)
+
+
+def file_time(name, mtime):
+    """Tidsstämpeln i filnamnet om den finns (mtime ändras vid checkout)"""
+    match = _TIMESTAMP_RE.search(name)
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").timestamp()
+    return mtime
+
+
+def referenced_paths(path):
+    """Bild-, video- och ljudfiler som en publicerad post pekar på"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if not isinstance(data, dict):
+        return []
+    if data.get("status") != "published" and not path.startswith("published"):
+        return []
+    return [os.path.normpath(data[key]) for key in ("image_path", "video_path", "audio_path")
+            if data.get(key)]
+
+
+def refresh_inventory(directory, state, referenced):
+    """
+    Uppdaterar inventeringen för en katalog. Läser bara om katalogen om
+    dess mtime ändrats, och parsar bara JSON-filer som är nya sedan förra körningen.
+    """
+    entry = state["dirs"].setdefault(directory, {"dir_mtime": None, "files": {}})
+    if not os.path.isdir(directory):
+        entry["files"] = {}
+        return entry
+
+    dir_mtime = os.stat(directory).st_mtime
+    if dir_mtime == entry["dir_mtime"]:
+        return entry
+
+    known = entry["files"]
+    files = {}
+    with os.scandir(directory) as it:
+        for item in it:
+            if not item.is_file():
+                continue
+            if item.name in known:
+                files[item.name] = known[item.name]
+                continue
+            st = item.stat()
+            files[item.name] = [st.st_size, file_time(item.name, st.st_mtime)]
+            if item.name.endswith(".json"):
+                referenced.update(referenced_paths(os.path.join(directory, item.name)))
+
+    entry["files"] = files
+    entry["dir_mtime"] = dir_mtime
+    return entry
+
+
+def archive_metadata(paths, dry_run):
+    """
+    Lägger metadata-filerna som rader i gzip-arkivet och tar bort dem.
+    Returnerar de sökvägar som faktiskt arkiverades - filer som inte går
+    att läsa ligger kvar och provas igen nästa körning.
+    """
+    if not paths or dry_run:
+        return list(paths)
+    os.makedirs(os.path.dirname(ARCHIVE_FILE), exist_ok=True)
+    archived_at = datetime.now().isoformat()
+    archived = []
+    # Varje körning blir en egen gzip-medlem; gzip läser dem som en ström
+    with gzip.open(ARCHIVE_FILE, 'at', encoding='utf-8') as archive:
+        for path in paths:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Hoppar över {path}: {e}")
+                continue
+            record = {"path": path, "archived_at": archived_at, "data": data}
+            archive.write(json.dumps(record, ensure_ascii=False) + "\n")
+            archived.append(path)
+    for path in archived:
+        if os.path.exists(path):
+            os.remove(path)
+    return archived
+
+
+def remove_files(paths, dry_run):
+    if not dry_run:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+    return list(paths)
+
+
+def apply_policy(directory, policy, entry, referenced, now, dry_run):
+    """Returnerar (antal borttagna/arkiverade, frigjorda bytes)"""
+    cutoff = (now - timedelta(days=policy["max_age_days"])).timestamp()
+    files = entry["files"]
+
+    # De senaste filerna behålls alltid (t.ex. publiceringshistoriken)
+    newest = sorted(files, key=lambda name: files[name][1], reverse=True)
+    kept = set(newest[:policy.get("keep_latest", 0)])
+
+    def is_protected(name):
+        return name in kept or os.path.normpath(os.path.join(directory, name)) in referenced
+
+    expired = [name for name, (_, ts) in files.items() if ts < cutoff and not is_protected(name)]
+
+    max_bytes = policy.get("max_total_mb")
+    if max_bytes:
+        max_bytes *= 1024 * 1024
+        total = sum(size for name, (size, _) in files.items() if name not in expired)
+        if total > max_bytes:
+            # Äldst först tills vi är under gränsen
+            remaining = sorted((ts, name) for name, (_, ts) in files.items()
+                               if name not in expired and not is_protected(name))
+            for _, name in remaining:
+                if total <= max_bytes:
+                    break
+                expired.append(name)
+                total -= files[name][0]
+
+    if not expired:
+        return 0, 0
+
+    paths = [os.path.join(directory, name) for name in expired]
+    if policy.get("archive"):
+        removed = archive_metadata([p for p in paths if p.endswith(".json")], dry_run)
+        removed += remove_files([p for p in paths if not p.endswith(".json")], dry_run)
+    else:
+        removed = remove_files(paths, dry_run)
+
+    removed_names = [os.path.basename(path) for path in removed]
+    freed = sum(files[name][0] for name in removed_names)
+
+    if not dry_run:
+        for name in removed_names:
+            files.pop(name, None)
+        entry["dir_mtime"] = os.stat(directory).st_mtime
+    return len(removed_names), freed
+
+
+def run_compaction(dry_run=False):
+    print("🧹 Kör retention/compaction...")
+    state = load_state()
+    referenced = set(state.get("referenced", []))
+    now = datetime.now()
+
+    # Inventera allt först så att referenser från nya poster är kända
+    entries = {d: refresh_inventory(d, state, referenced) for d in POLICIES}
+
+    total_count, total_freed = 0, 0
+    for directory, policy in POLICIES.items():
+        count, freed = apply_policy(directory, policy, entries[directory], referenced, now, dry_run)
+        if count:
+            action = "arkiveras" if policy.get("archive") else "tas bort"
+            prefix = "(dry-run) " if dry_run else ""
+            print(f"   {prefix}{directory}: {count} filer {action} ({freed / 1024 / 1024:.1f} MB)")
+        total_count += count
+        total_freed += freed
+
+    # Referenser sparas så att arkiverade poster fortsätter skydda sina filer
+    state["referenced"] = sorted(p for p in referenced if os.path.exists(p))
+    state["last_run"] = now.isoformat()
+    if not dry_run:
+        save_state(state)
+
+    print(f"✅ Klart: {total_count} filer, {total_freed / 1024 / 1024:.1f} MB frigjort")
+    return total_count, total_freed
+
+
+if __name__ == "__main__":
+    run_compaction(dry_run="--dry-run" in sys.argv)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS Stage - Parallell, cachad text-till-tal för Konto 2-5
+
+Varje manus syntetiseras högst en gång: utdata cachas under
+generated/audio/cache/ med en hash av synthesizer, text, röst och
+hastighet som namn. Stubben har en egen katalog (cache/stub) så att dess
+filer aldrig kan träffas av en riktig körning.
+Cachen hålls under CACHE_MAX_MB genom att de äldst använda filerna tas bort.
+
+Sätt TTS_SYNTHESIZER=stub för att köra utan edge-tts/nätverk.
+
+Användning:
+    python tts_stage.py [--stub] [--concurrency 4] "manus 1" "manus 2" ...
+"""
+
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import argparse
+
+CACHE_DIR = "generated/audio/cache"
+CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "200"))
+DEFAULT_VOICE = "sv-SE-MattiasNeural"
+DEFAULT_RATE = "+0%"
+DEFAULT_CONCURRENCY = 4
+
+
+class EdgeTTSSynthesizer:
+    """Microsoft Edge TTS via edge-tts"""
+
+    name = "edge-tts"
+    cache_dir = CACHE_DIR
+
+    async def synthesize(self, text, voice, rate, path):
+        import edge_tts
+        await edge_tts.Communicate(text, voice, rate=rate).save(path)
+
+
+class StubSynthesizer:
+    """Lokal stand-in: skriver en liten fil efter en valfri fördröjning"""
+
+    name = "stub"
+    cache_dir = f"{CACHE_DIR}/stub"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def synthesize(self, text, voice, rate, path):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        with open(path, 'wb') as f:
+            f.write(b"ID3STUB\n" + f"{voice}|{rate}|{text}".encode('utf-8'))
+
+
+def get_synthesizer():
+    if os.getenv("TTS_SYNTHESIZER") == "stub":
+        return StubSynthesizer()
+    return EdgeTTSSynthesizer()
+
+
+def cache_key(text, voice, rate, synthesizer):
+    key = f"{synthesizer.name}\0{voice}\0{rate}\0{text}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def cache_path(text, voice, rate, synthesizer):
+    return f"{synthesizer.cache_dir}/{cache_key(text, voice, rate, synthesizer)}.mp3"
+
+
+def evict_cache(max_bytes=None, keep=(), cache_dir=CACHE_DIR):
+    """Tar bort äldst använda filer tills cachen är under gränsen"""
+    max_bytes = CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    files = []
+    with os.scandir(cache_dir) as it:
+        for item in it:
+            if item.is_file() and item.name.endswith(".mp3") and item.path not in keep:
+                st = item.stat()
+                files.append((st.st_mtime, st.st_size, item.path))
+
+    total = sum(size for _, size, _ in files) + sum(
+        os.path.getsize(path) for path in keep if os.path.exists(path))
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+        removed += 1
+    return removed
+
+
+async def synthesize_many(scripts, voice=DEFAULT_VOICE, rate=DEFAULT_RATE,
+                          concurrency=DEFAULT_CONCURRENCY, synthesizer=None):
+    """
+    Syntetiserar alla manus med högst `concurrency` samtidiga anrop.
+    Returnerar en ljudfil per manus i samma ordning. Samma manus i en
+    batch syntetiseras bara en gång.
+    """
+    synthesizer = synthesizer or get_synthesizer()
+    os.makedirs(synthesizer.cache_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(concurrency)
+    in_flight = {}
+    stats = {"hits": 0, "misses": 0}
+
+    async def synthesize_one(text):
+        path = cache_path(text, voice, rate, synthesizer)
+        if os.path.exists(path):
+            stats["hits"] += 1
+            os.utime(path)  # markera som nyligen använd
+            return path
+
+        async with semaphore:
+            stats["misses"] += 1
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                await synthesizer.synthesize(text, voice, rate, tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return path
+
+    def task_for(text):
+        key = cache_key(text, voice, rate, synthesizer)
+        if key not in in_flight:
+            in_flight[key] = asyncio.ensure_future(synthesize_one(text))
+        return in_flight[key]
+
+    start = time.perf_counter()
+    paths = await asyncio.gather(*(task_for(text) for text in scripts))
+    removed = evict_cache(keep=set(paths), cache_dir=synthesizer.cache_dir)
+
+    print(f"🔊 TTS: {len(scripts)} manus, {stats['misses']} syntetiserade, "
+          f"{stats['hits']} från cache ({time.perf_counter() - start:.1f}s)"
+          + (f", {removed} cachefiler rensade" if removed else ""))
+    return list(paths)
+
+
+async def synthesize(text, voice=DEFAULT_VOICE, rate=DEFAULT_RATE, synthesizer=None):
+    paths = await synthesize_many([text], voice, rate, synthesizer=synthesizer)
+    return paths[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Syntetiserar manus till MP3 med cache")
+    parser.add_argument("scripts", nargs="+")
+    parser.add_argument("--voice", default=DEFAULT_VOICE)
+    parser.add_argument("--rate", default=DEFAULT_RATE)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--stub", action="store_true", help="använd lokal stub i stället för edge-tts")
+    args = parser.parse_args()
+
+    synthesizer = StubSynthesizer(delay=0.2) if args.stub else None
+    paths = asyncio.run(synthesize_many(args.scripts, args.voice, args.rate,
+                                        args.concurrency, synthesizer))
+    for text, path in zip(args.scripts, paths):
+        print(f"   {path}  ←  {text[:50]}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
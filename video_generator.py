@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Video Generator - Animerade graf-videor för Konto 4 och 5
+
+Bakgrunden (axlar, titel, rutnät) renderas en gång. Varje frame
+återställer bara bakgrunden och ritar om de animerade delarna (blitting).
+RGBA-bufferten skrivs direkt till ffmpeg:s stdin, så inga mellanliggande
+PNG-filer skrivs. Eventuellt TTS-ljud muxas in i samma ffmpeg-körning.
+
+Användning:
+    python video_generator.py [--audio latest|fil.mp3] [--duration 60] [--fps 30]
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+import subprocess
+from datetime import datetime
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import FuncFormatter
+import matplotlib.dates as mdates
+
+from caption_templates import format_sek
+
+VIDEO_DIR = "generated/videos"
+AUDIO_DIR = "generated/audio"
+FFMPEG = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+# Andel av klippet där linjen ritas, resten hålls sista bilden
+DRAW_FRACTION = 0.85
+
+
+def latest_audio():
+    """Senaste MP3:n i generated/audio (None om ingen finns)"""
+    files = sorted(glob.glob(f"{AUDIO_DIR}/*.mp3"), key=os.path.getmtime)
+    return files[-1] if files else None
+
+
+def _ffmpeg_command(width, height, fps, duration, output_path, audio_path):
+    cmd = [FFMPEG, "-y", "-loglevel", "error",
+           "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}",
+           "-r", str(fps), "-i", "-"]
+    if audio_path:
+        cmd += ["-i", audio_path]
+    cmd += ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p"]
+    if audio_path:
+        # Kortare ljud fylls ut med tystnad så att videon behåller sin längd
+        cmd += ["-af", "apad", "-c:a", "aac", "-b:a", "128k"]
+    cmd += ["-t", f"{duration:g}"]
+    cmd += ["-movflags", "+faststart", output_path]
+    return cmd
+
+
+def render_chart_video(dates, values, title, audio_path=None, duration=60, fps=30,
+                       size=(1080, 1920), output_path=None):
+    """
+    Renderar en video där prislinjen ritas fram över tid.
+
+    Returnerar dict med sökväg, renderingstid och tid per 60 s klipp.
+    """
+    os.makedirs(VIDEO_DIR, exist_ok=True)
+    if output_path is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_path = f"{VIDEO_DIR}/chart_{timestamp}.mp4"
+
+    print(f"🎬 Renderar video: {title} ({duration}s, {fps} fps)")
+    start = time.perf_counter()
+
+    x = mdates.date2num(list(dates))
+    y = np.asarray(values, dtype=float)
+
+    dpi = 100
+    fig = Figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi, facecolor='white')
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+
+    # Statisk bakgrund - ritas bara en gång
+    margin = (y.max() - y.min()) * 0.15 or y.max() * 0.05
+    ax.set_xlim(x[0], x[-1])
+    ax.set_ylim(y.min() - margin, y.max() + margin)
+    ax.set_title(title, fontsize=28, fontweight='bold', pad=30)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%b'))
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda v, p: f'{v / 1000000:.1f}M'))
+    ax.tick_params(labelsize=18)
+    ax.grid(True, alpha=0.3, linestyle='--')
+    fig.text(0.95, 0.02, 'Källa: SCB | @HousingStats', ha='right', fontsize=16,
+             style='italic', color='gray')
+    fig.tight_layout(rect=(0, 0.04, 1, 0.96))
+
+    line, = ax.plot([], [], linewidth=5, color='#2E86AB', animated=True)
+    head, = ax.plot([], [], 'o', markersize=18, color='#A23B72', animated=True)
+    label = ax.text(0.03, 0.95, '', transform=ax.transAxes, fontsize=30,
+                    fontweight='bold', va='top', animated=True)
+
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
+    width, height = canvas.get_width_height()
+
+    proc = subprocess.Popen(_ffmpeg_command(width, height, fps, duration, output_path, audio_path),
+                            stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    total_frames = int(duration * fps)
+    draw_frames = max(1, int(total_frames * DRAW_FRACTION))
+    rendered = 0
+    written = 0
+    pipe_closed = False
+
+    try:
+        for frame in range(total_frames):
+            if frame <= draw_frames:
+                # Position längs serien, interpolerad mellan datapunkter
+                pos = (len(x) - 1) * min(frame / draw_frames, 1.0)
+                i = int(pos)
+                frac = pos - i
+                j = min(i + 1, len(x) - 1)
+                head_x = x[i] + (x[j] - x[i]) * frac
+                head_y = y[i] + (y[j] - y[i]) * frac
+
+                line.set_data(np.append(x[:i + 1], head_x), np.append(y[:i + 1], head_y))
+                head.set_data([head_x], [head_y])
+                label.set_text(format_sek(head_y))
+
+                canvas.restore_region(background)
+                ax.draw_artist(line)
+                ax.draw_artist(head)
+                ax.draw_artist(label)
+                canvas.blit(fig.bbox)
+                rendered += 1
+
+            # Efter framritningen är bufferten oförändrad och skrivs bara igen
+            proc.stdin.write(canvas.buffer_rgba())
+            written += 1
+    except BrokenPipeError:
+        pipe_closed = True
+    finally:
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            # ffmpeg kan avsluta direkt efter sista framen (-t)
+            pass
+        stderr = proc.stderr.read().decode('utf-8', errors='replace')
+        proc.wait()
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg misslyckades ({proc.returncode}): {stderr.strip()}")
+    if pipe_closed or written < total_frames:
+        raise RuntimeError(f"ffmpeg stängde pipen efter {written}/{total_frames} frames: "
+                           f"{stderr.strip()}")
+
+    elapsed = time.perf_counter() - start
+    per_minute = elapsed * 60 / duration
+    print(f"✅ Video sparad: {output_path}")
+    print(f"⏱️ {elapsed:.1f}s för {total_frames} frames ({rendered} ritade), "
+          f"{per_minute:.1f}s per 60 s klipp")
+
+    return {
+        "path": output_path,
+        "frames": total_frames,
+        "drawn_frames": rendered,
+        "render_s": round(elapsed, 2),
+        "render_s_per_60s": round(per_minute, 2),
+    }
+
+
+def render_housing_video(df, audio_path=None, duration=60, fps=30):
+    """Prisutvecklings-video från konto1:s DataFrame (date, price, region)"""
+    region = df['region'].iloc[0]
+    return render_chart_video(df['date'], df['price'], f'Småhuspriser - {region}',
+                              audio_path=audio_path, duration=duration, fps=fps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Renderar en animerad prisgraf-video")
+    parser.add_argument("--audio", help="MP3 att muxa in, eller 'latest'")
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--fps", type=int, default=30)
+    args = parser.parse_args()
+
+    audio_path = latest_audio() if args.audio == "latest" else args.audio
+    if args.audio == "latest" and audio_path is None:
+        print(f"⚠️ Ingen MP3 i {AUDIO_DIR}, renderar utan ljud")
+
+    from konto1_housing_stats import create_realistic_mock_data
+    render_housing_video(create_realistic_mock_data(), audio_path, args.duration, args.fps)
+
+
+if __name__ == "__main__":
+    sys.exit(main())